@@ -1,5 +1,27 @@
 #!/usr/bin/env python
-from http import server # Python 3
+import datetime
+import email.utils
+from http import HTTPStatus, server # Python 3
+import os
+from typing import Dict, Tuple
+
+
+# path -> (mtime_ns, size, contents), so each file is kept in memory at most once
+_file_cache: Dict[str, Tuple[int, int, bytes]] = {}
+
+
+def _load_file(path: str, mtime_ns: int, size: int) -> bytes:
+    # Files whose modification time or size changed since they were cached
+    # (e.g. rebuilt ones) are re-read, without restarting the server.
+    cached = _file_cache.get(path)
+    if cached is not None and cached[:2] == (mtime_ns, size):
+        return cached[2]
+
+    with open(path, "rb") as f:
+        body = f.read()
+    _file_cache[path] = (mtime_ns, size, body)
+    return body
+
 
 class MyHTTPRequestHandler(server.SimpleHTTPRequestHandler):
     def end_headers(self) -> None:
@@ -11,8 +33,47 @@ class MyHTTPRequestHandler(server.SimpleHTTPRequestHandler):
         self.send_header("Cross-Origin-Opener-Policy", "same-origin")
         self.send_header("Cross-Origin-Embedder-Policy", "require-corp")
 
+    def is_unmodified_since(self, mtime: float) -> bool:
+        # Same conditional-GET check as SimpleHTTPRequestHandler.send_head(),
+        # which is bypassed for files served from the cache.
+        if "If-Modified-Since" not in self.headers or "If-None-Match" in self.headers:
+            return False
+
+        try:
+            since = email.utils.parsedate_to_datetime(self.headers["If-Modified-Since"])
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        if since.tzinfo is not datetime.timezone.utc:
+            return False
+
+        last_modified = datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+
     def do_GET(self) -> None:
-        return super().do_GET()
+        path = self.translate_path(self.path)
+        try:
+            stat = os.stat(path)
+            if self.is_unmodified_since(stat.st_mtime) and os.path.isfile(path):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.end_headers()
+                return
+
+            body = _load_file(path, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            # Directories, missing files etc. get the default handling.
+            return super().do_GET()
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-type", self.guess_type(path))
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Last-Modified", self.date_time_string(int(stat.st_mtime)))
+        self.end_headers()
+        self.wfile.write(body)
 
 if __name__ == '__main__':
-    server.test(HandlerClass=MyHTTPRequestHandler)
+    # server.test() overwrites the handler's protocol_version, so HTTP/1.1 (and with it
+    # keep-alive, so assets share a connection) has to be requested here.
+    server.test(HandlerClass=MyHTTPRequestHandler, protocol="HTTP/1.1")
@@ -1,5 +1,17 @@
 from abc import ABCMeta, abstractmethod
-from typing import Any, Generic, Iterable, Iterator, Mapping, Optional, Tuple, TypeVar
+from array import array
+from typing import (
+    Any,
+    Generic,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 
 Token = TypeVar("Token")
@@ -18,8 +30,6 @@ class Adapter(Generic[Token], metaclass=ABCMeta):
         self,
         edge_name: str,
         parameters: Mapping[str, Any],
-        *args: Any,
-        **kwargs: Any,
     ) -> Iterable[Token]:
         pass
 
@@ -29,8 +39,6 @@ class Adapter(Generic[Token], metaclass=ABCMeta):
         data_contexts: Iterator[DataContext[Token]],
         type_name: str,
         field_name: str,
-        *args: Any,
-        **kwargs: Any,
     ) -> Iterable[Tuple[DataContext[Token], Any]]:
         pass
 
@@ -41,9 +49,13 @@ class Adapter(Generic[Token], metaclass=ABCMeta):
         type_name: str,
         edge_name: str,
         parameters: Mapping[str, Any],
-        *args: Any,
-        **kwargs: Any,
     ) -> Iterable[Tuple[DataContext[Token], Iterable[Token]]]:
+        """Produce (context, neighbors) pairs, where neighbors is an iterable of tokens.
+
+        If the tokens are integers, neighbors may also be an int64 buffer such as
+        array.array("q") or an int64 NumPy array. Those are read in one go rather than
+        item by item.
+        """
         pass
 
     @abstractmethod
@@ -52,7 +64,17 @@ class Adapter(Generic[Token], metaclass=ABCMeta):
         data_contexts: Iterator[DataContext[Token]],
         type_name: str,
         coerce_to_type: str,
-        *args: Any,
-        **kwargs: Any,
-    ) -> Iterable[Tuple[DataContext[Token], bool]]:
+    ) -> Iterable[
+        Union[
+            Tuple[DataContext[Token], bool],
+            Tuple[Sequence[DataContext[Token]], array],
+        ]
+    ]:
+        """Produce (context, can_coerce) pairs.
+
+        Instead of a single pair, any item may also be a (contexts, flags) chunk: a sequence of
+        contexts and a parallel array.array("b") holding 1 for each context that can be coerced
+        and 0 otherwise. That avoids creating a Python bool and a tuple for every context.
+        Either way, data_contexts must be consumed lazily, as the results are read.
+        """
         pass
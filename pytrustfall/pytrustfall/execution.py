@@ -1,7 +1,7 @@
 from typing import Any, Dict, Iterator, Mapping, Type
 
 from .adapter import Adapter
-from .pytrustfall import AdapterShim, Schema, interpret_query
+from .pytrustfall import DEFAULT_BATCH_SIZE, AdapterShim, Schema, interpret_query
 
 
 def execute_query(
@@ -9,11 +9,17 @@ def execute_query(
     schema: Schema,
     query: str,
     arguments: Mapping[str, Any],
+    batch_size: int = DEFAULT_BATCH_SIZE,
 ) -> Iterator[Dict[str, Any]]:
-    """Execute the given query using the adapter, returning an iterator of result dicts."""
+    """Execute the given query using the adapter, returning an iterator of result dicts.
+
+    The adapter's iterators are read up to batch_size items at a time, so adapters doing I/O
+    per item may want a smaller value.
+    """
     if not isinstance(adapter, Adapter):
         raise TypeError(
             f"Expected 'adapter' input to be a subclass of Adapter, but instead got: {adapter}"
         )
 
-    return interpret_query(AdapterShim(adapter), schema, query, arguments)
+    shim = AdapterShim(adapter, batch_size)
+    return interpret_query(shim, schema, query, arguments)
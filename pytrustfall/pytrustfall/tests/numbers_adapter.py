@@ -1,9 +1,10 @@
-from typing import Any, Mapping, Iterable, Iterator, Tuple
+from functools import partial
+from typing import Any, Callable, Dict, Mapping, Iterable, Iterator, Tuple
 
 from .. import Adapter, DataContext
 
 
-_NUMBER_NAMES = [
+_NUMBER_NAMES = (
     "zero",
     "one",
     "two",
@@ -15,43 +16,80 @@ _NUMBER_NAMES = [
     "eight",
     "nine",
     "ten",
-]
+)
+_NUMBER_NAMES_LEN = len(_NUMBER_NAMES)
 
 Token = int
 
 
+# The projections must consume data_contexts lazily: the interpreter holds a borrow
+# of the adapter while the adapter method is running, and pulling contexts may
+# require other adapter calls (e.g. for @fold outputs).
+def _project_value(
+    data_contexts: Iterator[DataContext[Token]],
+) -> Iterator[Tuple[DataContext[Token], Any]]:
+    return ((context, context.current_token) for context in data_contexts)
+
+
+def _project_name(
+    data_contexts: Iterator[DataContext[Token]],
+) -> Iterator[Tuple[DataContext[Token], Any]]:
+    names = _NUMBER_NAMES
+    names_count = _NUMBER_NAMES_LEN
+    return (
+        (
+            context,
+            names[token]
+            if (token := context.current_token) is not None and 0 <= token < names_count
+            else None,
+        )
+        for context in data_contexts
+    )
+
+
+_PROPERTY_PROJECTIONS: Dict[
+    str, Callable[[Iterator[DataContext[Token]]], Iterator[Tuple[DataContext[Token], Any]]]
+] = {
+    "value": _project_value,
+    "name": _project_name,
+}
+
+
+def _get_multiples(token: Token, max_value: int) -> Iterable[Token]:
+    if token > 0:
+        return range(2 * token, max_value * token + 1, token)
+    return ()
+
+
+def _get_predecessor(token: Token) -> Iterable[Token]:
+    if token > 0:
+        return (token - 1,)
+    return ()
+
+
+def _get_successor(token: Token) -> Iterable[Token]:
+    return (token + 1,)
+
+
 class NumbersAdapter(Adapter[Token]):
     def get_starting_tokens(
         self,
         edge_name: str,
         parameters: Mapping[str, Any],
-        *args: Any,
-        **kwargs: Any,
     ) -> Iterable[Token]:
         max_value = parameters["max"]
-        yield from range(0, max_value)
+        return range(0, max_value)
 
     def project_property(
         self,
         data_contexts: Iterator[DataContext[Token]],
         type_name: str,
         field_name: str,
-        *args: Any,
-        **kwargs: Any,
     ) -> Iterable[Tuple[DataContext[Token], Any]]:
-        for context in data_contexts:
-            token = context.current_token
-            value = None
-            if token is not None:
-                if field_name == "value":
-                    value = token
-                elif field_name == "name":
-                    if 0 <= token < len(_NUMBER_NAMES):
-                        value = _NUMBER_NAMES[token]
-                else:
-                    raise NotImplementedError()
-
-            yield (context, value)
+        project = _PROPERTY_PROJECTIONS.get(field_name)
+        if project is None:
+            raise NotImplementedError()
+        return project(data_contexts)
 
     def project_neighbors(
         self,
@@ -59,33 +97,29 @@ class NumbersAdapter(Adapter[Token]):
         type_name: str,
         edge_name: str,
         parameters: Mapping[str, Any],
-        *args: Any,
-        **kwargs: Any,
     ) -> Iterable[Tuple[DataContext[Token], Iterable[Token]]]:
-        for context in data_contexts:
-            token = context.current_token
-            neighbors = []
-            if token is not None:
-                if edge_name == "multiple":
-                    if token > 0:
-                        max_value = parameters["max"]
-                        neighbors = range(2 * token, max_value * token + 1, token)
-                elif edge_name == "predecessor":
-                    if token > 0:
-                        neighbors = [token - 1]
-                elif edge_name == "successor":
-                    neighbors = [token + 1]
-                else:
-                    raise NotImplementedError()
-
-            yield (context, neighbors)
+        get_neighbors: Callable[[Token], Iterable[Token]]
+        if edge_name == "multiple":
+            get_neighbors = partial(_get_multiples, max_value=parameters["max"])
+        elif edge_name == "predecessor":
+            get_neighbors = _get_predecessor
+        elif edge_name == "successor":
+            get_neighbors = _get_successor
+        else:
+            raise NotImplementedError()
+
+        return (
+            (
+                context,
+                get_neighbors(token) if (token := context.current_token) is not None else (),
+            )
+            for context in data_contexts
+        )
 
     def can_coerce_to_type(
         self,
         data_contexts: Iterator[DataContext[Token]],
         type_name: str,
         coerce_to_type: str,
-        *args: Any,
-        **kwargs: Any,
     ) -> Iterable[Tuple[DataContext[Token], bool]]:
         raise NotImplementedError()
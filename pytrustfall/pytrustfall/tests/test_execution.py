@@ -1,18 +1,23 @@
+from array import array
+from itertools import islice
 from os import path
 from textwrap import dedent
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
 import unittest
 
 from ..pytrustfall import (
+    AdapterShim,
     FrontendError,
     InvalidIRQueryError,
     ParseError,
     QueryArgumentsError,
     Schema,
     ValidationError,
+    interpret_query,
 )
+from ..adapter import DataContext
 from ..execution import execute_query
-from .numbers_adapter import NumbersAdapter
+from .numbers_adapter import NumbersAdapter, Token
 
 
 def _get_numbers_schema() -> Schema:
@@ -25,6 +30,107 @@ def _get_numbers_schema() -> Schema:
 SCHEMA = _get_numbers_schema()
 
 
+class ArrayNeighborsNumbersAdapter(NumbersAdapter):
+    """NumbersAdapter variant that returns neighbors as int64 buffers instead of iterables."""
+
+    def project_neighbors(
+        self,
+        data_contexts: Iterator[DataContext[Token]],
+        type_name: str,
+        edge_name: str,
+        parameters: Mapping[str, Any],
+    ) -> Iterable[Tuple[DataContext[Token], Iterable[Token]]]:
+        return (
+            (context, array("q", neighbors))
+            for context, neighbors in super().project_neighbors(
+                data_contexts, type_name, edge_name, parameters
+            )
+        )
+
+
+PRIMES_SCHEMA_TEXT = """\
+schema {
+    query: RootSchemaQuery
+}
+directive @filter(op: String!, value: [String!]) on FIELD | INLINE_FRAGMENT
+directive @tag(name: String) on FIELD
+directive @output(name: String) on FIELD
+directive @optional on FIELD
+directive @recurse(depth: Int!) on FIELD
+directive @fold on FIELD
+
+type RootSchemaQuery {
+    Number(max: Int!): [Number!]
+}
+
+interface Number {
+    value: Int!
+    multiple(max: Int!): [Number!]
+    successor: Number!
+}
+
+type Prime implements Number {
+    value: Int!
+    multiple(max: Int!): [Number!]
+    successor: Number!
+}
+
+type Composite implements Number {
+    value: Int!
+    multiple(max: Int!): [Number!]
+    successor: Number!
+}
+"""
+PRIMES_SCHEMA = Schema(PRIMES_SCHEMA_TEXT)
+
+
+def _can_coerce(token: Optional[Token], coerce_to_type: str) -> bool:
+    if token is None:
+        return False
+
+    is_prime = token >= 2 and all(token % divisor for divisor in range(2, token))
+    if coerce_to_type == "Prime":
+        return is_prime
+    elif coerce_to_type == "Composite":
+        return token >= 2 and not is_prime
+    else:
+        raise NotImplementedError()
+
+
+class PrimesAdapter(NumbersAdapter):
+    """NumbersAdapter variant for PRIMES_SCHEMA, whose numbers are prime or composite."""
+
+    def can_coerce_to_type(
+        self,
+        data_contexts: Iterator[DataContext[Token]],
+        type_name: str,
+        coerce_to_type: str,
+    ) -> Iterable[Tuple[DataContext[Token], bool]]:
+        return (
+            (context, _can_coerce(context.current_token, coerce_to_type))
+            for context in data_contexts
+        )
+
+
+class PackedPrimesAdapter(NumbersAdapter):
+    """PrimesAdapter variant that returns coercion results in chunks with packed int8 flags."""
+
+    def can_coerce_to_type(
+        self,
+        data_contexts: Iterator[DataContext[Token]],
+        type_name: str,
+        coerce_to_type: str,
+    ) -> Iterator[Tuple[List[DataContext[Token]], array]]:
+        while True:
+            contexts = list(islice(data_contexts, 3))
+            if not contexts:
+                return
+            flags = array(
+                "b", [_can_coerce(context.current_token, coerce_to_type) for context in contexts]
+            )
+            yield contexts, flags
+
+
 class ExecutionTests(unittest.TestCase):
     def test_simple_query(self) -> None:
         query = dedent(
@@ -105,6 +211,260 @@ class ExecutionTests(unittest.TestCase):
         actual_result = list(execute_query(NumbersAdapter(), SCHEMA, query, args))
         self.assertEqual(expected_result, actual_result)
 
+    def test_fold_query(self) -> None:
+        query = dedent(
+            """\
+            {
+                Number(max: 4) {
+                    value @output
+                    name @output
+
+                    multiple(max: 3) @fold {
+                        mul: value @output
+                    }
+                }
+            }
+            """
+        )
+        args: Dict[str, Any] = {}
+
+        expected_result = [
+            {"value": 0, "name": "zero", "mul": []},
+            {"value": 1, "name": "one", "mul": [2, 3]},
+            {"value": 2, "name": "two", "mul": [4, 6]},
+            {"value": 3, "name": "three", "mul": [6, 9]},
+        ]
+        actual_result = list(execute_query(NumbersAdapter(), SCHEMA, query, args))
+        self.assertEqual(expected_result, actual_result)
+
+    def test_edge_after_fold_query(self) -> None:
+        query = dedent(
+            """\
+            {
+                Number(max: 4) {
+                    value @output
+
+                    multiple(max: 3) @fold {
+                        mul: value @output
+                    }
+                    successor {
+                        next: value @output
+                    }
+                }
+            }
+            """
+        )
+        args: Dict[str, Any] = {}
+
+        expected_result = [
+            {"value": 0, "mul": [], "next": 1},
+            {"value": 1, "mul": [2, 3], "next": 2},
+            {"value": 2, "mul": [4, 6], "next": 3},
+            {"value": 3, "mul": [6, 9], "next": 4},
+        ]
+        actual_result = list(execute_query(NumbersAdapter(), SCHEMA, query, args))
+        self.assertEqual(expected_result, actual_result)
+
+    def test_nested_query_with_buffer_neighbors(self) -> None:
+        query = dedent(
+            """\
+            {
+                Number(max: 4) {
+                    value @output
+
+                    multiple(max: 3) {
+                        mul: value @output
+                    }
+                    successor {
+                        next: value @output
+                    }
+                }
+            }
+            """
+        )
+        args: Dict[str, Any] = {}
+
+        expected_result = [
+            {"value": 1, "mul": 2, "next": 2},
+            {"value": 1, "mul": 3, "next": 2},
+            {"value": 2, "mul": 4, "next": 3},
+            {"value": 2, "mul": 6, "next": 3},
+            {"value": 3, "mul": 6, "next": 4},
+            {"value": 3, "mul": 9, "next": 4},
+        ]
+        actual_result = list(execute_query(ArrayNeighborsNumbersAdapter(), SCHEMA, query, args))
+        self.assertEqual(expected_result, actual_result)
+
+    def test_results_do_not_depend_on_batch_size(self) -> None:
+        # There are 7 starting numbers and 6 results. The batch sizes below include
+        # exact multiples of those counts as well as ones that leave a partial last batch.
+        query = dedent(
+            """\
+            {
+                Number(max: 7) {
+                    value @output @filter(op: ">", value: ["$min"])
+
+                    multiple(max: 3) {
+                        mul: value @output
+                        name @output
+                    }
+                }
+            }
+            """
+        )
+        args: Dict[str, Any] = {
+            "min": 3,
+        }
+
+        expected_result = [
+            {"value": 4, "mul": 8, "name": "eight"},
+            {"value": 4, "mul": 12, "name": None},
+            {"value": 5, "mul": 10, "name": "ten"},
+            {"value": 5, "mul": 15, "name": None},
+            {"value": 6, "mul": 12, "name": None},
+            {"value": 6, "mul": 18, "name": None},
+        ]
+        self.assertEqual(
+            expected_result, list(execute_query(NumbersAdapter(), SCHEMA, query, args))
+        )
+        for batch_size in (1, 3, 4, 6, 7):
+            with self.subTest(batch_size=batch_size):
+                actual_result = list(
+                    interpret_query(
+                        AdapterShim(NumbersAdapter(), batch_size=batch_size), SCHEMA, query, args
+                    )
+                )
+                self.assertEqual(expected_result, actual_result)
+
+                actual_result = list(
+                    execute_query(NumbersAdapter(), SCHEMA, query, args, batch_size=batch_size)
+                )
+                self.assertEqual(expected_result, actual_result)
+
+    def test_starting_tokens_on_batch_boundary(self) -> None:
+        query = dedent(
+            """\
+            {
+                Number(max: 6) {
+                    value @output
+                }
+            }
+            """
+        )
+        args: Dict[str, Any] = {}
+
+        expected_result = [{"value": value} for value in range(6)]
+        for batch_size in (1, 2, 3, 6):
+            with self.subTest(batch_size=batch_size):
+                actual_result = list(
+                    execute_query(NumbersAdapter(), SCHEMA, query, args, batch_size=batch_size)
+                )
+                self.assertEqual(expected_result, actual_result)
+
+    def test_zero_batch_size_error(self) -> None:
+        self.assertRaises(ValueError, AdapterShim, NumbersAdapter(), batch_size=0)
+
+        query = dedent(
+            """\
+            {
+                Number(max: 4) {
+                    value @output
+                }
+            }
+            """
+        )
+        args: Dict[str, Any] = {}
+
+        self.assertRaises(
+            ValueError, execute_query, NumbersAdapter(), SCHEMA, query, args, batch_size=0
+        )
+
+    def test_type_coercion(self) -> None:
+        query = dedent(
+            """\
+            {
+                Number(max: 10) {
+                    ... on Prime {
+                        value @output
+                    }
+                }
+            }
+            """
+        )
+        args: Dict[str, Any] = {}
+
+        expected_result = [
+            {"value": 2},
+            {"value": 3},
+            {"value": 5},
+            {"value": 7},
+        ]
+        for adapter in (PrimesAdapter(), PackedPrimesAdapter()):
+            with self.subTest(adapter=type(adapter).__name__):
+                actual_result = list(execute_query(adapter, PRIMES_SCHEMA, query, args))
+                self.assertEqual(expected_result, actual_result)
+
+    def test_type_coercion_across_batches(self) -> None:
+        query = dedent(
+            """\
+            {
+                Number(max: 10) {
+                    ... on Composite {
+                        value @output
+                    }
+                }
+            }
+            """
+        )
+        args: Dict[str, Any] = {}
+
+        expected_result = [
+            {"value": 4},
+            {"value": 6},
+            {"value": 8},
+            {"value": 9},
+        ]
+        for batch_size in (1, 3, 10):
+            with self.subTest(batch_size=batch_size):
+                actual_result = list(
+                    execute_query(
+                        PackedPrimesAdapter(), PRIMES_SCHEMA, query, args, batch_size=batch_size
+                    )
+                )
+                self.assertEqual(expected_result, actual_result)
+
+    def test_type_coercion_after_fold(self) -> None:
+        # can_coerce_to_type() must consume its contexts lazily: pulling them during the call
+        # itself would run the upstream @fold's adapter calls while the adapter is still borrowed.
+        query = dedent(
+            """\
+            {
+                Number(max: 6) {
+                    value @output
+                    multiple(max: 3) @fold {
+                        mul: value @output
+                    }
+                    successor {
+                        ... on Prime {
+                            next: value @output
+                        }
+                    }
+                }
+            }
+            """
+        )
+        args: Dict[str, Any] = {}
+
+        expected_result = [
+            {"value": 1, "mul": [2, 3], "next": 2},
+            {"value": 2, "mul": [4, 6], "next": 3},
+            {"value": 4, "mul": [8, 12], "next": 5},
+        ]
+        for adapter in (PrimesAdapter(), PackedPrimesAdapter()):
+            with self.subTest(adapter=type(adapter).__name__):
+                actual_result = list(execute_query(adapter, PRIMES_SCHEMA, query, args))
+                self.assertEqual(expected_result, actual_result)
+
     def test_parse_error(self) -> None:
         query = "this isn't valid syntax"
         args: Dict[str, Any] = {}
@@ -1,9 +1,18 @@
 #![allow(unused_imports)]
 
-use std::{cell::RefCell, collections::BTreeMap, fs, rc::Rc, sync::Arc};
+use std::{
+    cell::RefCell,
+    collections::{BTreeMap, VecDeque},
+    fs,
+    rc::Rc,
+    sync::Arc,
+};
 
 use pyo3::{
-    exceptions::PyStopIteration, prelude::*, types::PyTuple, wrap_pyfunction, PyIterProtocol,
+    buffer::{Element, PyBuffer},
+    exceptions::PyValueError,
+    prelude::*,
+    wrap_pyfunction, AsPyPointer, PyIterProtocol,
 };
 
 use trustfall_core::{
@@ -15,6 +24,7 @@ use trustfall_core::{
 use crate::errors::{InvalidSchemaError, QueryArgumentsError};
 
 pub(crate) fn register(_py: Python, m: &PyModule) -> PyResult<()> {
+    m.add("DEFAULT_BATCH_SIZE", DEFAULT_BATCH_SIZE)?;
     m.add_class::<Schema>()?;
     m.add_class::<AdapterShim>()?;
     m.add_class::<ResultIterator>()?;
@@ -133,17 +143,34 @@ impl PyIterProtocol for ResultIterator {
     }
 }
 
+/// How many items to pull from a Python iterator each time we acquire the GIL.
+const DEFAULT_BATCH_SIZE: usize = 1024;
+
+/// Wraps a Python adapter for use by the interpreter.
+///
+/// Each iterator the adapter returns is read up to `batch_size` items ahead of what
+/// the interpreter has consumed, to amortize the cost of acquiring the GIL.
 #[pyclass]
 #[derive(Clone)]
 pub struct AdapterShim {
     adapter: Py<PyAny>,
+    batch_size: usize,
 }
 
 #[pymethods]
 impl AdapterShim {
     #[new]
-    pub fn new(adapter: Py<PyAny>) -> Self {
-        AdapterShim { adapter }
+    #[args(batch_size = "DEFAULT_BATCH_SIZE")]
+    pub fn new(adapter: Py<PyAny>, batch_size: usize) -> PyResult<Self> {
+        if batch_size == 0 {
+            return Err(PyValueError::new_err(
+                "batch_size must be a positive integer",
+            ));
+        }
+        Ok(AdapterShim {
+            adapter,
+            batch_size,
+        })
     }
 }
 
@@ -204,7 +231,9 @@ fn make_iterator(py: Python, value: Py<PyAny>) -> PyResult<Py<PyAny>> {
     value.call_method(py, "__iter__", (), None)
 }
 
-#[pyclass]
+// Every context handed to Python is a new object, so keep freed ones around for reuse
+// instead of going back to the allocator for each one.
+#[pyclass(freelist = 1024)]
 #[derive(Debug, Clone)]
 pub struct Context(DataContext<Arc<Py<PyAny>>>);
 
@@ -254,7 +283,7 @@ impl Adapter<'static> for AdapterShim {
                     .collect()
             });
 
-            let py_iter = self
+            let py_iterable = self
                 .adapter
                 .call_method(
                     py,
@@ -263,7 +292,9 @@ impl Adapter<'static> for AdapterShim {
                     None,
                 )
                 .unwrap();
-            Box::new(PythonTokenIterator::new(py_iter))
+
+            let py_iter = make_iterator(py, py_iterable).unwrap();
+            Box::new(make_token_iterator(py_iter, self.batch_size))
         })
     }
 
@@ -288,7 +319,7 @@ impl Adapter<'static> for AdapterShim {
                 .unwrap();
 
             let iter = make_iterator(py, py_iterable).unwrap();
-            Box::new(PythonProjectPropertyIterator::new(iter))
+            Box::new(make_project_property_iterator(iter, self.batch_size))
         })
     }
 
@@ -334,7 +365,7 @@ impl Adapter<'static> for AdapterShim {
                 .unwrap();
 
             let iter = make_iterator(py, py_iterable).unwrap();
-            Box::new(PythonProjectNeighborsIterator::new(iter))
+            Box::new(make_project_neighbors_iterator(iter, self.batch_size))
         })
     }
 
@@ -363,185 +394,199 @@ impl Adapter<'static> for AdapterShim {
                 .unwrap();
 
             let iter = make_iterator(py, py_iterable).unwrap();
-            Box::new(PythonCanCoerceToTypeIterator::new(iter))
+            Box::new(make_can_coerce_to_type_iterator(iter, self.batch_size))
         })
     }
 }
 
-struct PythonTokenIterator {
+/// Drains a Python iterator in batches, acquiring the GIL once per batch of items
+/// instead of once per item.
+struct PythonBatchedIterator<T, F> {
     underlying: Py<PyAny>,
+    batch_size: usize,
+    buffer: VecDeque<T>,
+    exhausted: bool,
+    convert: F,
 }
 
-impl PythonTokenIterator {
-    fn new(underlying: Py<PyAny>) -> Self {
-        Self { underlying }
+impl<T, F> PythonBatchedIterator<T, F>
+where
+    F: Fn(Python, &PyAny) -> T,
+{
+    fn new(underlying: Py<PyAny>, batch_size: usize, convert: F) -> Self {
+        Self {
+            underlying,
+            batch_size,
+            buffer: VecDeque::new(),
+            exhausted: false,
+            convert,
+        }
     }
-}
 
-impl Iterator for PythonTokenIterator {
-    type Item = Arc<Py<PyAny>>;
+    fn fill_buffer(&mut self) {
+        let batch_size = self.batch_size;
+        let underlying = &self.underlying;
+        let convert = &self.convert;
+        let buffer = &mut self.buffer;
 
-    fn next(&mut self) -> Option<Self::Item> {
-        Python::with_gil(
-            |py| match self.underlying.call_method(py, "__next__", (), None) {
-                Ok(value) => Some(Arc::new(value)),
-                Err(e) => {
-                    if e.is_instance::<PyStopIteration>(py) {
-                        None
-                    } else {
+        Python::with_gil(|py| {
+            let iter = underlying.as_ref(py).iter().unwrap();
+            for item in iter.take(batch_size) {
+                match item {
+                    Ok(value) => buffer.push_back(convert(py, value)),
+                    Err(e) => {
                         println!("Got error: {:?}", e);
                         e.print(py);
                         panic!();
                     }
                 }
-            },
-        )
-    }
-}
-
-struct PythonProjectPropertyIterator {
-    underlying: Py<PyAny>,
-}
+            }
+        });
 
-impl PythonProjectPropertyIterator {
-    fn new(underlying: Py<PyAny>) -> Self {
-        Self { underlying }
+        // The buffer was empty before we started, so a short batch means we're done.
+        self.exhausted = self.buffer.len() < batch_size;
     }
 }
 
-impl Iterator for PythonProjectPropertyIterator {
-    type Item = (DataContext<Arc<Py<PyAny>>>, FieldValue);
+impl<T, F> Iterator for PythonBatchedIterator<T, F>
+where
+    F: Fn(Python, &PyAny) -> T,
+{
+    type Item = T;
 
     fn next(&mut self) -> Option<Self::Item> {
-        Python::with_gil(|py| {
-            match self.underlying.call_method(py, "__next__", (), None) {
-                Ok(output) => {
-                    // value is a (context, property_value) tuple here
-                    let context: Context = output
-                        .call_method(py, "__getitem__", (0i64,), None)
-                        .unwrap()
-                        .extract(py)
-                        .unwrap();
-
-                    // TODO: if this panics, we got an unrepresentable FieldValue,
-                    //       which should be a proper error
-                    let value: FieldValue = make_field_value_from_ref(
-                        output
-                            .call_method(py, "__getitem__", (1i64,), None)
-                            .unwrap()
-                            .as_ref(py),
-                    )
-                    .unwrap();
-
-                    Some((context.0, value))
-                }
-                Err(e) => {
-                    if e.is_instance::<PyStopIteration>(py) {
-                        None
-                    } else {
-                        println!("Got error: {:?}", e);
-                        e.print(py);
-                        panic!();
-                    }
-                }
-            }
-        })
+        if self.buffer.is_empty() && !self.exhausted {
+            self.fill_buffer();
+        }
+        self.buffer.pop_front()
     }
 }
 
-struct PythonProjectNeighborsIterator {
+fn make_token_iterator(
     underlying: Py<PyAny>,
+    batch_size: usize,
+) -> impl Iterator<Item = Arc<Py<PyAny>>> {
+    PythonBatchedIterator::new(underlying, batch_size, |py, value| {
+        Arc::new(value.into_py(py))
+    })
 }
 
-impl PythonProjectNeighborsIterator {
-    fn new(underlying: Py<PyAny>) -> Self {
-        Self { underlying }
-    }
+fn make_project_property_iterator(
+    underlying: Py<PyAny>,
+    batch_size: usize,
+) -> impl Iterator<Item = (DataContext<Arc<Py<PyAny>>>, FieldValue)> {
+    PythonBatchedIterator::new(underlying, batch_size, |_py, output| {
+        // value is a (context, property_value) tuple here
+        let context: Context = output.get_item(0i64).unwrap().extract().unwrap();
+
+        // TODO: if this panics, we got an unrepresentable FieldValue,
+        //       which should be a proper error
+        let value: FieldValue = make_field_value_from_ref(output.get_item(1i64).unwrap()).unwrap();
+
+        (context.0, value)
+    })
 }
 
-impl Iterator for PythonProjectNeighborsIterator {
-    #[allow(clippy::type_complexity)]
-    type Item = (
+#[allow(clippy::type_complexity)]
+fn make_project_neighbors_iterator(
+    underlying: Py<PyAny>,
+    batch_size: usize,
+) -> impl Iterator<
+    Item = (
         DataContext<Arc<Py<PyAny>>>,
         Box<dyn Iterator<Item = Arc<Py<PyAny>>>>,
-    );
+    ),
+> {
+    PythonBatchedIterator::new(underlying, batch_size, move |py, output| {
+        // value is a (context, neighbor_iterator) tuple here
+        let context: Context = output.get_item(0i64).unwrap().extract().unwrap();
+        let neighbors_iterable = output.get_item(1i64).unwrap();
+
+        let neighbors: Box<dyn Iterator<Item = Arc<Py<PyAny>>>> =
+            if let Some(buffer) = get_buffer::<i64>(neighbors_iterable) {
+                // Integer buffers (e.g. `array.array("q")` or int64 NumPy arrays)
+                // are copied out in one go, instead of being iterated one item at a time.
+                let tokens: Vec<Arc<Py<PyAny>>> = buffer
+                    .to_vec(py)
+                    .unwrap()
+                    .into_iter()
+                    .map(|token| Arc::new(token.into_py(py)))
+                    .collect();
+                Box::new(tokens.into_iter())
+            } else {
+                // Allow returning iterables (e.g. []), not just iterators.
+                // Iterators return self when __iter__() is called.
+                let neighbors_iter = make_iterator(py, neighbors_iterable.into_py(py)).unwrap();
+                Box::new(make_token_iterator(neighbors_iter, batch_size))
+            };
+        (context.0, neighbors)
+    })
+}
 
-    fn next(&mut self) -> Option<Self::Item> {
-        Python::with_gil(|py| {
-            match self.underlying.call_method(py, "__next__", (), None) {
-                Ok(output) => {
-                    // value is a (context, neighbor_iterator) tuple here
-                    let context: Context = output
-                        .call_method(py, "__getitem__", (0i64,), None)
-                        .unwrap()
-                        .extract(py)
-                        .unwrap();
-                    let neighbors_iterable = output
-                        .call_method(py, "__getitem__", (1i64,), None)
-                        .unwrap();
-
-                    // Allow returning iterables (e.g. []), not just iterators.
-                    // Iterators return self when __iter__() is called.
-                    let neighbors_iter = make_iterator(py, neighbors_iterable).unwrap();
-
-                    let neighbors: Box<dyn Iterator<Item = Arc<Py<PyAny>>>> =
-                        Box::new(PythonTokenIterator::new(neighbors_iter));
-                    Some((context.0, neighbors))
-                }
-                Err(e) => {
-                    if e.is_instance::<PyStopIteration>(py) {
-                        None
-                    } else {
-                        println!("Got error: {:?}", e);
-                        e.print(py);
-                        panic!();
-                    }
-                }
-            }
-        })
+/// Returns the object's contents as a buffer of `T`, if it exposes a compatible one.
+///
+/// Checks for buffer support first: asking a non-buffer object for its buffer raises
+/// a `TypeError`, which is far more expensive than the check for the common case.
+fn get_buffer<T: Element>(value: &PyAny) -> Option<PyBuffer<T>> {
+    if unsafe { pyo3::ffi::PyObject_CheckBuffer(value.as_ptr()) } == 0 {
+        return None;
     }
+    PyBuffer::get(value).ok()
 }
 
-struct PythonCanCoerceToTypeIterator {
+fn make_can_coerce_to_type_iterator(
     underlying: Py<PyAny>,
+    batch_size: usize,
+) -> impl Iterator<Item = (DataContext<Arc<Py<PyAny>>>, bool)> {
+    PythonBatchedIterator::new(underlying, batch_size, |py, output| {
+        // value is a (context, can_coerce) tuple here, or a (contexts, flags) tuple
+        // where flags is an int8 buffer (e.g. `array.array("b")`) parallel to contexts
+        let first = output.get_item(0i64).unwrap();
+        let second = output.get_item(1i64).unwrap();
+
+        if let Some(flags) = get_buffer::<i8>(second) {
+            let flags = flags.to_vec(py).unwrap();
+            let contexts: Vec<DataContext<Arc<Py<PyAny>>>> = first
+                .iter()
+                .unwrap()
+                .map(|value| {
+                    let context: Context = value.unwrap().extract().unwrap();
+                    context.0
+                })
+                .collect();
+            if contexts.len() > flags.len() {
+                panic!("can_coerce_to_type returned fewer flags than contexts");
+            } else if contexts.len() < flags.len() {
+                panic!("can_coerce_to_type returned more flags than contexts");
+            }
+            CoercionResults::Packed(contexts.into_iter(), flags.into_iter())
+        } else {
+            let context: Context = first.extract().unwrap();
+            let can_coerce: bool = second.extract().unwrap();
+            CoercionResults::Single(Some((context.0, can_coerce)))
+        }
+    })
+    .flatten()
 }
 
-impl PythonCanCoerceToTypeIterator {
-    fn new(underlying: Py<PyAny>) -> Self {
-        Self { underlying }
-    }
+/// The `(context, can_coerce)` pairs from one item of a `can_coerce_to_type()` result.
+enum CoercionResults {
+    Single(Option<(DataContext<Arc<Py<PyAny>>>, bool)>),
+    Packed(
+        std::vec::IntoIter<DataContext<Arc<Py<PyAny>>>>,
+        std::vec::IntoIter<i8>,
+    ),
 }
 
-impl Iterator for PythonCanCoerceToTypeIterator {
+impl Iterator for CoercionResults {
     type Item = (DataContext<Arc<Py<PyAny>>>, bool);
 
     fn next(&mut self) -> Option<Self::Item> {
-        Python::with_gil(|py| {
-            match self.underlying.call_method(py, "__next__", (), None) {
-                Ok(output) => {
-                    // value is a (context, can_coerce) tuple here
-                    let context: Context = output
-                        .call_method(py, "__getitem__", (0i64,), None)
-                        .unwrap()
-                        .extract(py)
-                        .unwrap();
-                    let can_coerce: bool = output
-                        .call_method(py, "__getitem__", (1i64,), None)
-                        .unwrap()
-                        .extract::<bool>(py)
-                        .unwrap();
-                    Some((context.0, can_coerce))
-                }
-                Err(e) => {
-                    if e.is_instance::<PyStopIteration>(py) {
-                        None
-                    } else {
-                        println!("Got error: {:?}", e);
-                        e.print(py);
-                        panic!();
-                    }
-                }
+        match self {
+            CoercionResults::Single(pair) => pair.take(),
+            CoercionResults::Packed(contexts, flags) => {
+                Some((contexts.next()?, flags.next().unwrap() != 0))
             }
-        })
+        }
     }
 }